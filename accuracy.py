@@ -4,7 +4,8 @@ import re
 from itertools import permutations
 from typing import Optional
 
-from load import load_model_task_data, load_tasks_data
+from cache import disk_cache
+from load import get_model_task_data_path, load_model_task_data, load_tasks_data
 
 
 class Split(Enum):
@@ -17,16 +18,27 @@ def get_accuracy_per_model(task_name: str, split: Optional[Split] = None):
     task = tasks[task_name]
     instance_accuracy_per_model = {}
     for model_name in task["models"]:
-        model_results = load_model_task_data(task_name, model_name)
-        instance_accuracy_per_model[
-            model_name
-        ] = _get_instance_accuracy_for_single_model(
-            model_results["request_states"], task_name, split
+        instance_accuracy_per_model[model_name] = get_accuracy_for_model(
+            task_name, model_name, split
         )
 
     return instance_accuracy_per_model
 
 
+@disk_cache(
+    input_files=lambda task_name, model_name, split=None: [
+        get_model_task_data_path(task_name, model_name)
+    ]
+)
+def get_accuracy_for_model(
+    task_name: str, model_name: str, split: Optional[Split] = None
+):
+    model_results = load_model_task_data(task_name, model_name)
+    return _get_instance_accuracy_for_single_model(
+        model_results["request_states"], task_name, split
+    )
+
+
 def get_accuracy_per_trial(instance_results_per_model: dict):
     result = defaultdict(list)
     for model_name, model_results in instance_results_per_model.items():
@@ -40,6 +52,16 @@ def get_accuracy_per_trial(instance_results_per_model: dict):
     return result
 
 
+def get_split_per_trial(instance_results_per_model: dict):
+    result = {}
+    for model_results in instance_results_per_model.values():
+        for instance_result in model_results:
+            result[f'{instance_result["id"]}_{instance_result["trial"]}'] = (
+                instance_result["split"]
+            )
+    return result
+
+
 def _response_is_exact_match(response: dict):
     expected, completion = _get_expected_and_completion(response)
     return int(expected == completion.strip()), expected, completion
@@ -128,6 +150,7 @@ def _get_instance_accuracy_for_single_model(
             {
                 "id": f'{response["instance"]["id"]}_{response["train_trial_index"]}',
                 "trial": response["train_trial_index"],
+                "split": response["instance"]["split"],
                 "is_correct": is_correct,
                 "expected": expected,
                 "actual": prediction,
@@ -1,9 +1,11 @@
 import numpy as np
 from sklearn.linear_model import LogisticRegression
 
+from cache import disk_cache
 from difficulty import convert_difficulties_to_quantiles
 
 
+@disk_cache()
 def get_logistic_agent_characteristic(
     instance_difficulties: dict[str, float],
     correct: dict[str, int],
@@ -0,0 +1,117 @@
+import numpy as np
+
+from accuracy import get_accuracy_for_model
+from cache import disk_cache
+from load import get_model_task_data_path
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], np.uint8)
+
+    def _popcount(packed: np.ndarray):
+        return _POPCOUNT_TABLE[packed]
+
+
+def pack_correctness(model_results: list[dict]):
+    trial_ids = [f'{result["id"]}_{result["trial"]}' for result in model_results]
+    correct = np.array([result["is_correct"] for result in model_results], dtype=bool)
+    return trial_ids, np.packbits(correct)
+
+
+@disk_cache(
+    input_files=lambda task_name, model_name: [
+        get_model_task_data_path(task_name, model_name)
+    ]
+)
+def get_correctness_bits_for_model(task_name: str, model_name: str):
+    return pack_correctness(get_accuracy_for_model(task_name, model_name))
+
+
+def stack_correctness_bits(
+    packed_correctness_per_model: dict[str, tuple[list[str], np.ndarray]],
+):
+    model_names = list(packed_correctness_per_model)
+    if not model_names:
+        return model_names, np.zeros((0, 0), np.uint8), 0
+    packed_correctness = list(packed_correctness_per_model.values())
+    first_trial_ids = packed_correctness[0][0]
+    if all(trial_ids == first_trial_ids for trial_ids, _ in packed_correctness):
+        bits = np.stack([model_bits for _, model_bits in packed_correctness])
+        return model_names, bits, len(first_trial_ids)
+
+    common_trial_ids = set.intersection(
+        *(set(trial_ids) for trial_ids, _ in packed_correctness)
+    )
+    trial_ids = [
+        trial_id for trial_id in first_trial_ids if trial_id in common_trial_ids
+    ]
+    rows = []
+    for model_trial_ids, model_bits in packed_correctness:
+        index_per_trial = {
+            trial_id: index for index, trial_id in enumerate(model_trial_ids)
+        }
+        correct = np.unpackbits(model_bits, count=len(model_trial_ids)).astype(bool)
+        indices = np.array(
+            [index_per_trial[trial_id] for trial_id in trial_ids], dtype=np.int64
+        )
+        rows.append(np.packbits(correct[indices]))
+    return model_names, np.stack(rows), len(trial_ids)
+
+
+def get_correctness_bits(instance_accuracy_per_model: dict):
+    return stack_correctness_bits(
+        {
+            model_name: pack_correctness(model_results)
+            for model_name, model_results in instance_accuracy_per_model.items()
+        }
+    )
+
+
+def concatenate_correctness_bits(correctness_bits: list[tuple]):
+    model_names = [
+        model_name
+        for model_name in correctness_bits[0][0]
+        if all(
+            model_name in task_model_names
+            for task_model_names, _, _ in correctness_bits
+        )
+    ]
+    bits = np.concatenate(
+        [
+            task_bits[
+                [task_model_names.index(model_name) for model_name in model_names]
+            ]
+            for task_model_names, task_bits, _ in correctness_bits
+        ],
+        axis=1,
+    )
+    num_trials = sum(task_num_trials for _, _, task_num_trials in correctness_bits)
+    return model_names, bits, num_trials
+
+
+def get_pairwise_agreement(bits: np.ndarray, num_trials: int):
+    n = num_trials
+    num_correct = _popcount(bits).sum(axis=1, dtype=np.int64)
+    both_correct = np.array(
+        [_popcount(row & bits).sum(axis=1, dtype=np.int64) for row in bits],
+        dtype=np.int64,
+    ).reshape(len(bits), len(bits))
+    both_wrong = n - num_correct[:, None] - num_correct[None, :] + both_correct
+
+    c_i = num_correct[:, None].astype(np.float64)
+    c_j = num_correct[None, :].astype(np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        agreement = (both_correct + both_wrong) / n
+        chance_agreement = (c_i * c_j + (n - c_i) * (n - c_j)) / n**2
+        kappa = (agreement - chance_agreement) / (1 - chance_agreement)
+        error_correlation = (n * both_correct - c_i * c_j) / np.sqrt(
+            (c_i * (n - c_i)) * (c_j * (n - c_j))
+        )
+    return {
+        "Agreement": agreement,
+        "Joint errors": both_wrong,
+        "Cohen's kappa": kappa,
+        "Error correlation": error_correlation,
+    }
@@ -0,0 +1,174 @@
+import functools
+import glob
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from typing import Callable, Optional
+
+DEFAULT_MAX_CACHE_BYTES = 1024**3
+
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+_file_digests = {}
+_code_dir = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_dir():
+    if "HELM_CACHE_DIR" in os.environ:
+        return os.environ["HELM_CACHE_DIR"]
+    return os.path.join(os.environ["HELM_DATA_DIR"], ".cache")
+
+
+def get_max_cache_bytes():
+    return int(os.environ.get("HELM_CACHE_MAX_BYTES", DEFAULT_MAX_CACHE_BYTES))
+
+
+def disk_cache(input_files: Optional[Callable[..., list[str]]] = None):
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        def get_path(*args, **kwargs):
+            bound_arguments = signature.bind(*args, **kwargs)
+            bound_arguments.apply_defaults()
+            files = input_files(*args, **kwargs) if input_files is not None else []
+            key = _get_key(function, bound_arguments.arguments, files)
+            return os.path.join(get_cache_dir(), f"{key}.pkl")
+
+        def is_cached(*args, **kwargs):
+            return os.path.exists(get_path(*args, **kwargs))
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            path = get_path(*args, **kwargs)
+            try:
+                with open(path, "rb") as f:
+                    result = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                _increment("misses")
+            else:
+                _increment("hits")
+                _touch(path)
+                return result
+            result = function(*args, **kwargs)
+            _store(path, result)
+            return result
+
+        wrapper.is_cached = is_cached
+        return wrapper
+
+    return decorator
+
+
+def get_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    entries = _list_entries()
+    stats["entries"] = len(entries)
+    stats["size_bytes"] = sum(size for _, _, size in entries)
+    return stats
+
+
+def clear_cache():
+    for path, _, _ in _list_entries():
+        _remove(path)
+
+
+def _get_key(function, arguments, files):
+    hasher = hashlib.sha256()
+    hasher.update(f"{function.__module__}.{function.__qualname__}".encode())
+    hasher.update(_get_code_version().encode())
+    for file in files:
+        hasher.update(_get_file_digest(file).encode())
+    hasher.update(pickle.dumps(list(arguments.items())))
+    return hasher.hexdigest()
+
+
+def _get_code_version():
+    return "".join(
+        _get_file_digest(module_file)
+        for module_file in sorted(glob.glob(os.path.join(_code_dir, "*.py")))
+    )
+
+
+def _get_file_digest(path):
+    stat = os.stat(path)
+    fingerprint = (path, stat.st_size, stat.st_mtime_ns)
+    if fingerprint not in _file_digests:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(chunk)
+        _file_digests[fingerprint] = hasher.hexdigest()
+    return _file_digests[fingerprint]
+
+
+def _store(path, result):
+    cache_dir = os.path.dirname(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=cache_dir, suffix=".tmp", delete=False
+        ) as f:
+            try:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                f.close()
+                _remove(f.name)
+                raise
+        os.replace(f.name, path)
+        _evict(get_max_cache_bytes())
+    except (OSError, pickle.PicklingError) as error:
+        logger.warning(f"Could not write to cache directory {cache_dir}: {error!r}")
+
+
+def _evict(max_bytes: int):
+    entries = sorted(_list_entries(), key=lambda entry: entry[1])
+    total_bytes = sum(size for _, _, size in entries)
+    for path, _, size in entries:
+        if total_bytes <= max_bytes:
+            break
+        _remove(path)
+        total_bytes -= size
+        _increment("evictions")
+
+
+def _list_entries():
+    try:
+        with os.scandir(get_cache_dir()) as it:
+            entries = []
+            for entry in it:
+                if not entry.name.endswith(".pkl"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_mtime_ns, stat.st_size))
+            return entries
+    except OSError:
+        return []
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _increment(stat_name: str):
+    with _stats_lock:
+        _stats[stat_name] += 1
@@ -1,4 +1,8 @@
 import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Optional
 
 import numpy as np
 import streamlit as st
@@ -6,17 +10,36 @@ import pandas as pd
 import altair as alt
 
 
-from load import load_tasks_data
+from load import get_model_task_data_path, load_tasks_data
 from difficulty import (
     get_difficulty_per_trial,
     convert_difficulties_to_quantiles,
     quantize_difficulties,
 )
-from accuracy import get_accuracy_per_trial, get_accuracy_per_model
+from agreement import (
+    concatenate_correctness_bits,
+    get_correctness_bits_for_model,
+    get_pairwise_agreement,
+    stack_correctness_bits,
+)
+from accuracy import (
+    get_accuracy_per_trial,
+    get_accuracy_for_model,
+    get_split_per_trial,
+)
 from agent_characteristic import get_logistic_agent_characteristic, get_auc
+from sampling import (
+    filter_trials,
+    get_progressive_sample_sizes,
+    get_stratified_trial_sample,
+)
 
-
-get_accuracy_per_model_with_cache = st.cache(get_accuracy_per_model)
+MAX_WORKERS = 8
+CURVE_OPACITY = alt.Opacity(
+    "curve:N",
+    scale=alt.Scale(domain=["latest", "previous pass"], range=[1.0, 0.3]),
+    legend=None,
+)
 
 tasks = load_tasks_data()
 
@@ -28,10 +51,6 @@ def render_dashboard():
 
     st.multiselect("Models", options=tasks[task]["models"], key="models")
 
-    accuracy_per_model = get_accuracy_per_model_with_cache(task)
-
-    accuracy_per_trial = get_accuracy_per_trial(accuracy_per_model)
-
     st.selectbox("Plot type", options=["Logistic fit", "Binned"], key="plot_type")
 
     if st.session_state["plot_type"] == "Binned":
@@ -41,33 +60,351 @@ def render_dashboard():
         "X-axis", options=["Difficulty quantile", "Raw difficulty"], key="x_axis"
     )
 
-    instance_difficulties = get_difficulty_per_trial(
-        accuracy_per_trial, exclude_models=st.session_state["models"]
-    )
-
     if st.session_state["x_axis"] == "Difficulty quantile":
         difficulty_column_name = "Difficulty quantile"
 
     else:
         difficulty_column_name = "Difficulty"
 
-    if st.session_state["plot_type"] == "Logistic fit":
-        create_logistic_acc_plot(
-            accuracy_per_model, instance_difficulties, difficulty_column_name
+    st.checkbox("Approximate preview", key="approximate")
+
+    if st.session_state["approximate"]:
+        st.number_input(
+            "Latency budget (s)", value=1.0, min_value=0.1, key="latency_budget"
         )
 
+    reference_models = [
+        model_name
+        for model_name in tasks[task]["models"]
+        if model_name not in st.session_state["models"]
+    ]
+    # Streamlit interrupts the script on rerun, so don't wait for queued work.
+    scoring_executor = ThreadPoolExecutor(MAX_WORKERS)
+    fitting_executor = ThreadPoolExecutor(MAX_WORKERS)
+    try:
+        accuracy_futures = {
+            model_name: scoring_executor.submit(
+                get_accuracy_for_model, task, model_name
+            )
+            for model_name in reference_models + st.session_state["models"]
+        }
+        reference_accuracy_per_model = get_reference_accuracy_per_model(
+            accuracy_futures, reference_models
+        )
+        accuracy_per_trial = get_accuracy_per_trial(reference_accuracy_per_model)
+        instance_difficulties = get_difficulty_per_trial(accuracy_per_trial)
+        split_per_trial = get_split_per_trial(reference_accuracy_per_model)
+
+        render_plots(
+            task,
+            accuracy_futures,
+            instance_difficulties,
+            split_per_trial,
+            difficulty_column_name,
+            fitting_executor,
+        )
+
+        render_agreement_heatmap(task)
+    finally:
+        scoring_executor.shutdown(wait=False, cancel_futures=True)
+        fitting_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_reference_accuracy_per_model(
+    accuracy_futures: dict[str, Future], reference_models: list[str]
+):
+    progress = st.progress(0)
+    reference_accuracy_per_model = {}
+    for num_done, model_name in enumerate(reference_models, 1):
+        try:
+            reference_accuracy_per_model[model_name] = accuracy_futures[
+                model_name
+            ].result()
+        except Exception as error:
+            st.warning(f"Could not load {model_name}: {error!r}")
+        progress.progress(num_done / len(reference_models))
+    progress.empty()
+    return reference_accuracy_per_model
+
+
+def render_plots(
+    task: str,
+    accuracy_futures: dict[str, Future],
+    instance_difficulties: dict[str, float],
+    split_per_trial: dict[str, str],
+    difficulty_column_name: str,
+    executor: ThreadPoolExecutor,
+):
+    badge = st.empty()
+    progress = st.empty()
+    acc_plot = st.empty()
+    auc_plot = st.empty()
+    with open("models.json") as f:
+        params_per_model = json.load(f)
+    num_trials = len(instance_difficulties)
+    plot_inputs = (
+        task,
+        tuple(st.session_state["models"]),
+        st.session_state["plot_type"],
+        st.session_state["x_axis"],
+        st.session_state.get("num_bins"),
+    )
+    seconds_per_trial_per_model = st.session_state.setdefault(
+        "seconds_per_trial_per_model", {}
+    )
+    if (
+        st.session_state["approximate"]
+        and st.session_state.get("exact_plot_inputs") != plot_inputs
+    ):
+        seconds_per_trial = None
+        if task in seconds_per_trial_per_model:
+            seconds_per_trial = seconds_per_trial_per_model[task] * len(
+                st.session_state["models"]
+            )
+        sample_sizes = get_progressive_sample_sizes(
+            num_trials, st.session_state["latency_budget"], seconds_per_trial
+        )
+    else:
+        sample_sizes = [num_trials]
+
+    acc_df_per_model = {}
+    auc_per_model = {}
+    errors_per_model = {}
+    for sample_size in sample_sizes:
+        # Curves from the previous pass stay up, faded, until they are replaced.
+        stale_models = set(acc_df_per_model)
+        if sample_size < num_trials:
+            trial_ids = get_stratified_trial_sample(
+                instance_difficulties, split_per_trial, sample_size
+            )
+            badge.info(f"Approximate, n = {len(trial_ids):,} of {num_trials:,} trials")
+        else:
+            trial_ids = None
+
+        model_names_per_future = {
+            executor.submit(
+                get_plot_data_for_model,
+                model_name,
+                accuracy_futures[model_name],
+                instance_difficulties,
+                trial_ids,
+                difficulty_column_name,
+                st.session_state["plot_type"],
+                st.session_state["x_axis"],
+                st.session_state.get("num_bins"),
+            ): model_name
+            for model_name in st.session_state["models"]
+            if model_name not in errors_per_model
+        }
+        fit_seconds_per_trial = []
+        progress.progress(0.0)
+        for num_done, future in enumerate(as_completed(model_names_per_future), 1):
+            model_name = model_names_per_future[future]
+            try:
+                acc_df, auc, fit_seconds = future.result()
+            except Exception as error:
+                errors_per_model[model_name] = error
+                acc_df_per_model.pop(model_name, None)
+                auc_per_model.pop(model_name, None)
+            else:
+                acc_df_per_model[model_name] = acc_df
+                auc_per_model[model_name] = auc
+                if fit_seconds is not None:
+                    fit_seconds_per_trial.append(fit_seconds / max(sample_size, 1))
+            stale_models.discard(model_name)
+            update_plots(
+                acc_df_per_model,
+                auc_per_model,
+                stale_models,
+                params_per_model,
+                difficulty_column_name,
+                acc_plot,
+                auc_plot,
+            )
+            progress.progress(num_done / len(model_names_per_future))
+        if fit_seconds_per_trial:
+            seconds_per_trial_per_model[task] = sum(fit_seconds_per_trial) / len(
+                fit_seconds_per_trial
+            )
+    st.session_state["exact_plot_inputs"] = plot_inputs
+    badge.empty()
+    progress.empty()
+
+    for model_name, error in errors_per_model.items():
+        st.warning(f"Could not plot {model_name}: {error!r}")
+    for model_name in auc_per_model:
+        if model_name not in params_per_model:
+            st.warning(f"{model_name} has no parameter count in models.json")
+
+
+def update_plots(
+    acc_df_per_model: dict[str, pd.DataFrame],
+    auc_per_model: dict[str, float],
+    stale_models: set[str],
+    params_per_model: dict[str, float],
+    difficulty_column_name: str,
+    acc_plot,
+    auc_plot,
+):
+    if not acc_df_per_model:
+        acc_plot.empty()
+        auc_plot.empty()
+        return
+    acc_df = pd.concat(acc_df_per_model.values())
+    acc_df["curve"] = np.where(
+        acc_df["model"].isin(stale_models), "previous pass", "latest"
+    )
+    if st.session_state["plot_type"] == "Logistic fit":
+        create_logistic_acc_plot(acc_df, difficulty_column_name, acc_plot)
     elif st.session_state["plot_type"] == "Binned":
-        create_binned_acc_plot(
-            accuracy_per_model, instance_difficulties, difficulty_column_name
+        create_binned_acc_plot(acc_df, difficulty_column_name, acc_plot)
+    create_auc_plot(auc_per_model, params_per_model, auc_plot)
+
+
+def render_agreement_heatmap(task: str):
+    st.selectbox(
+        "Agreement metric",
+        options=["Agreement", "Joint errors", "Cohen's kappa", "Error correlation"],
+        key="agreement_metric",
+    )
+    st.selectbox(
+        "Agreement scope", options=["This task", "All tasks"], key="agreement_scope"
+    )
+
+    if st.session_state["agreement_scope"] == "This task":
+        task_names = [task]
+    else:
+        task_names = list(tasks)
+    correctness_bits = []
+    for task_name in task_names:
+        data_version = get_task_data_version(task_name)
+        if all(file_version is None for file_version in data_version):
+            # tasks.json lists every known task, not only the downloaded ones.
+            continue
+        task_correctness_bits, errors_per_model = get_task_correctness_bits(
+            task_name, data_version
         )
-    create_auc_plot(accuracy_per_model, instance_difficulties)
+        if errors_per_model:
+            st.warning(f"Could not load {', '.join(errors_per_model)} for {task_name}")
+        if task_correctness_bits[0]:
+            correctness_bits.append(task_correctness_bits)
+    if not correctness_bits:
+        st.info("No model results are available for the agreement heatmap.")
+        return
+    model_names, bits, num_trials = concatenate_correctness_bits(correctness_bits)
+
+    metric = st.session_state["agreement_metric"]
+    df = get_df_for_agreement_heatmap(
+        model_names, get_pairwise_agreement(bits, num_trials)[metric], metric
+    )
+    chart = (
+        alt.Chart(df)
+        .mark_rect()
+        .encode(
+            x=alt.X("model A", sort=model_names),
+            y=alt.Y("model B", sort=model_names),
+            color=metric,
+            tooltip=["model A", "model B", metric],
+        )
+    )
+    st.altair_chart(chart, use_container_width=True)
+    st.caption(f"{len(model_names)} models, n = {num_trials:,} trials")
 
 
-def create_auc_plot(
-    instance_accuracy_per_model: dict[str, list[dict[str, int]]],
+@st.cache_data(show_spinner=False)
+def get_task_correctness_bits(task_name: str, data_version: tuple):
+    packed_correctness_per_model = {}
+    errors_per_model = {}
+    with ThreadPoolExecutor(MAX_WORKERS) as executor:
+        futures = {
+            model_name: executor.submit(
+                get_correctness_bits_for_model, task_name, model_name
+            )
+            for model_name in tasks[task_name]["models"]
+        }
+    for model_name, future in futures.items():
+        try:
+            packed_correctness_per_model[model_name] = future.result()
+        except Exception as error:
+            errors_per_model[model_name] = repr(error)
+    return stack_correctness_bits(packed_correctness_per_model), errors_per_model
+
+
+def get_task_data_version(task_name: str):
+    data_version = []
+    for model_name in tasks[task_name]["models"]:
+        try:
+            stat = os.stat(get_model_task_data_path(task_name, model_name))
+        except OSError:
+            data_version.append(None)
+        else:
+            data_version.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(data_version)
+
+
+def get_df_for_agreement_heatmap(
+    model_names: list[str], matrix: np.ndarray, metric: str
+):
+    df_dict = {
+        "model A": np.repeat(model_names, len(model_names)),
+        "model B": np.tile(model_names, len(model_names)),
+        metric: matrix.ravel(),
+    }
+    return pd.DataFrame(df_dict)
+
+
+def get_plot_data_for_model(
+    model_name: str,
+    accuracy_future: Future,
     instance_difficulties: dict[str, float],
+    trial_ids: Optional[set[str]],
+    difficulty_column_name: str,
+    plot_type: str,
+    x_axis: str,
+    num_bins: Optional[int],
 ):
-    df = get_df_for_auc_plot(instance_accuracy_per_model, instance_difficulties)
+    instance_accuracy_per_model = {model_name: accuracy_future.result()}
+    # Time only this thread's fitting work, so waiting on scoring or on other
+    # threads doesn't count towards the latency estimate.
+    start = time.thread_time()
+    if trial_ids is not None:
+        instance_accuracy_per_model, instance_difficulties = filter_trials(
+            instance_accuracy_per_model, instance_difficulties, trial_ids
+        )
+    correct = {
+        result["id"]: result["is_correct"]
+        for result in instance_accuracy_per_model[model_name]
+    }
+    quantiles = x_axis == "Difficulty quantile"
+    is_cached = get_logistic_agent_characteristic.is_cached(
+        instance_difficulties, correct, quantiles=quantiles
+    )
+    xs, ys = get_logistic_agent_characteristic(
+        instance_difficulties, correct, quantiles=quantiles
+    )
+    if plot_type == "Logistic fit":
+        acc_df = get_df_for_logistic_acc_plot(
+            model_name, xs, ys, difficulty_column_name
+        )
+    elif plot_type == "Binned":
+        acc_df = get_df_for_binned_acc_plot(
+            model_name,
+            correct,
+            instance_difficulties,
+            difficulty_column_name,
+            x_axis,
+            num_bins,
+        )
+    fit_seconds = None if is_cached else time.thread_time() - start
+    return acc_df, get_auc(xs, ys), fit_seconds
+
+
+def create_auc_plot(
+    auc_per_model: dict[str, float],
+    params_per_model: dict[str, float],
+    placeholder,
+):
+    df = get_df_for_auc_plot(auc_per_model, params_per_model)
     chart = (
         alt.Chart(df)
         .mark_line()
@@ -76,40 +413,27 @@ def create_auc_plot(
             y="AUC",
         )
     )
-    st.altair_chart(chart, use_container_width=True)
+    placeholder.altair_chart(chart, use_container_width=True)
 
 
 def get_df_for_auc_plot(
-    instance_accuracy_per_model: dict[str, list[dict[str, int]]],
-    instance_difficulties: dict[str, float],
+    auc_per_model: dict[str, float],
+    params_per_model: dict[str, float],
 ):
-    with open("models.json") as f:
-        params_per_model = json.load(f)
     df_dict = {"log(params)": [], "AUC": []}
-    for model_name in st.session_state["models"]:
-        correct = {
-            result["id"]: result["is_correct"]
-            for result in instance_accuracy_per_model[model_name]
-        }
-        xs, ys = get_logistic_agent_characteristic(
-            instance_difficulties,
-            correct,
-            quantiles=st.session_state["x_axis"] == "Difficulty quantile",
-        )
-        auc = get_auc(xs, ys)
+    for model_name, auc in auc_per_model.items():
+        if model_name not in params_per_model:
+            continue
         df_dict["log(params)"].append(np.log10(params_per_model[model_name]))
         df_dict["AUC"].append(auc)
     return pd.DataFrame(df_dict)
 
 
 def create_logistic_acc_plot(
-    instance_accuracy_per_model: dict[str, list[dict[str, int]]],
-    instance_difficulties: dict[str, float],
+    df: pd.DataFrame,
     difficulty_column_name: str,
+    placeholder,
 ):
-    df = get_df_for_logistic_acc_plot(
-        instance_accuracy_per_model, instance_difficulties, difficulty_column_name
-    )
     chart = (
         alt.Chart(df)
         .mark_line()
@@ -117,43 +441,31 @@ def create_logistic_acc_plot(
             x=difficulty_column_name,
             y="P(correct)",
             color="model",
+            opacity=CURVE_OPACITY,
         )
     )
-    st.altair_chart(chart, use_container_width=True)
+    placeholder.altair_chart(chart, use_container_width=True)
 
 
 def get_df_for_logistic_acc_plot(
-    instance_accuracy_per_model: dict[str, list[dict[str, int]]],
-    instance_difficulties: dict[str, float],
+    model_name: str,
+    xs: np.ndarray,
+    ys: np.ndarray,
     difficulty_column_name: str,
 ):
-    df_dict = {difficulty_column_name: [], "model": [], "P(correct)": []}
-    for model_name in st.session_state["models"]:
-        correct = {
-            result["id"]: result["is_correct"]
-            for result in instance_accuracy_per_model[model_name]
-        }
-        xs, ys = get_logistic_agent_characteristic(
-            instance_difficulties,
-            correct,
-            quantiles=st.session_state["x_axis"] == "Difficulty quantile",
-        )
-        df_dict[difficulty_column_name] += xs.tolist()
-        df_dict["model"] += [model_name] * len(xs)
-        df_dict["P(correct)"] += ys.tolist()
+    df_dict = {
+        difficulty_column_name: xs.tolist(),
+        "model": [model_name] * len(xs),
+        "P(correct)": ys.tolist(),
+    }
     return pd.DataFrame(df_dict)
 
 
 def create_binned_acc_plot(
-    instance_accuracy_per_model: dict[str, list[dict[str, int]]],
-    instance_difficulties: dict[str, float],
+    df: pd.DataFrame,
     difficulty_column_name: str,
+    placeholder,
 ):
-    df = get_df_for_binned_acc_plot(
-        instance_accuracy_per_model,
-        instance_difficulties,
-        difficulty_column_name,
-    )
     chart = (
         alt.Chart(df)
         .mark_line()
@@ -161,6 +473,7 @@ def create_binned_acc_plot(
             x=difficulty_column_name,
             y=alt.Y("mean(correct)", title="P(correct)"),
             color="model",
+            opacity=CURVE_OPACITY,
         )
     )
     error_bars = (
@@ -172,36 +485,27 @@ def create_binned_acc_plot(
             color="model",
         )
     )
-    st.altair_chart(chart + error_bars, use_container_width=True)
+    placeholder.altair_chart(chart + error_bars, use_container_width=True)
 
 
 def get_df_for_binned_acc_plot(
-    instance_accuracy_per_model: dict[str, list[dict[str, int]]],
+    model_name: str,
+    correct: dict[str, int],
     instance_difficulties: dict[str, float],
     difficulty_column_name: str,
+    x_axis: str,
+    num_bins: int,
 ):
+    ys = list(correct.values())
+    if x_axis == "Raw difficulty":
+        xs = quantize_difficulties(instance_difficulties, num_bins=num_bins)
+    elif x_axis == "Difficulty quantile":
+        xs = convert_difficulties_to_quantiles(instance_difficulties, num_bins=num_bins)
     df_dict = {
-        difficulty_column_name: [],
-        "model": [],
-        "correct": [],
+        difficulty_column_name: xs,
+        "model": [model_name] * len(xs),
+        "correct": ys,
     }
-    for model_name in st.session_state["models"]:
-        correct = {
-            result["id"]: result["is_correct"]
-            for result in instance_accuracy_per_model[model_name]
-        }
-        ys = list(correct.values())
-        if st.session_state["x_axis"] == "Raw difficulty":
-            xs = quantize_difficulties(
-                instance_difficulties, num_bins=st.session_state["num_bins"]
-            )
-        elif st.session_state["x_axis"] == "Difficulty quantile":
-            xs = convert_difficulties_to_quantiles(
-                instance_difficulties, num_bins=st.session_state["num_bins"]
-            )
-        df_dict[difficulty_column_name] += xs
-        df_dict["model"] += [model_name] * len(xs)
-        df_dict["correct"] += ys
     return pd.DataFrame(df_dict)
 
 
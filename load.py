@@ -2,13 +2,21 @@ import json
 import os
 
 
-def load_model_task_data(task_name, model_name):
+def get_model_task_data_path(task_name, model_name):
+    data_dir = os.environ["HELM_DATA_DIR"]
+    return os.path.join(data_dir, task_name, f"{model_name}.json")
+
+
+def get_tasks_data_path():
     data_dir = os.environ["HELM_DATA_DIR"]
-    with open(os.path.join(data_dir, task_name, f"{model_name}.json")) as f:
+    return os.path.join(data_dir, "tasks.json")
+
+
+def load_model_task_data(task_name, model_name):
+    with open(get_model_task_data_path(task_name, model_name)) as f:
         return json.load(f)
 
 
 def load_tasks_data():
-    data_dir = os.environ["HELM_DATA_DIR"]
-    with open(os.path.join(data_dir, "tasks.json")) as f:
+    with open(get_tasks_data_path()) as f:
         return json.load(f)
@@ -0,0 +1,82 @@
+import math
+import random
+from collections import defaultdict
+from typing import Optional
+
+MIN_SAMPLE_SIZE = 200
+
+
+def get_stratified_trial_sample(
+    instance_difficulties: dict[str, float],
+    split_per_trial: dict[str, str],
+    sample_size: int,
+    num_bins: int = 5,
+    seed: int = 0,
+):
+    if sample_size >= len(instance_difficulties):
+        return set(instance_difficulties)
+
+    strata = defaultdict(list)
+    for trial_id, difficulty in instance_difficulties.items():
+        difficulty_bin = min(max(int(difficulty * num_bins), 0), num_bins - 1)
+        strata[(split_per_trial.get(trial_id), difficulty_bin)].append(trial_id)
+
+    rng = random.Random(seed)
+    for stratum in sorted(strata, key=str):
+        rng.shuffle(strata[stratum])
+
+    quotas = {
+        stratum: sample_size * len(trial_ids) / len(instance_difficulties)
+        for stratum, trial_ids in strata.items()
+    }
+    counts = {stratum: math.floor(quota) for stratum, quota in quotas.items()}
+    by_remainder = sorted(
+        strata, key=lambda stratum: (counts[stratum] - quotas[stratum], str(stratum))
+    )
+    for stratum in by_remainder[: sample_size - sum(counts.values())]:
+        counts[stratum] += 1
+
+    return {
+        trial_id
+        for stratum, trial_ids in strata.items()
+        for trial_id in trial_ids[: max(counts[stratum], 1)]
+    }
+
+
+def filter_trials(
+    instance_accuracy_per_model: dict[str, list[dict[str, int]]],
+    instance_difficulties: dict[str, float],
+    trial_ids: set[str],
+):
+    filtered_accuracy_per_model = {
+        model_name: [
+            result
+            for result in model_results
+            if f'{result["id"]}_{result["trial"]}' in trial_ids
+        ]
+        for model_name, model_results in instance_accuracy_per_model.items()
+    }
+    filtered_difficulties = {
+        trial_id: difficulty
+        for trial_id, difficulty in instance_difficulties.items()
+        if trial_id in trial_ids
+    }
+    return filtered_accuracy_per_model, filtered_difficulties
+
+
+def get_progressive_sample_sizes(
+    num_trials: int,
+    latency_budget: float,
+    seconds_per_trial: Optional[float] = None,
+    growth_factor: int = 4,
+):
+    if seconds_per_trial is None or seconds_per_trial <= 0:
+        sample_size = MIN_SAMPLE_SIZE
+    else:
+        sample_size = max(int(latency_budget / seconds_per_trial), MIN_SAMPLE_SIZE)
+    sample_sizes = []
+    while sample_size < num_trials:
+        sample_sizes.append(sample_size)
+        sample_size *= growth_factor
+    sample_sizes.append(num_trials)
+    return sample_sizes